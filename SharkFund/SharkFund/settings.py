@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+import orjson
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -72,10 +73,31 @@ DEFAULT_FROM_EMAIL = 'no-reply@sharkfund.in'  # The default 'From' email
 # Set EMAIL_USE_TLS = False since you're using SSL (port 465)
 EMAIL_USE_TLS = False
 
+# Seconds before a stalled SMTP connect/send gives up; OTP mails share one
+# connection per worker, so a hung server must not block it indefinitely
+EMAIL_TIMEOUT = 10
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'cloudManager.middleware.auth_backend.CachedJWTAuthentication',
+    ),
+    # orjson encodes datetimes/decimals natively; OPT_UTC_Z keeps the
+    # trailing 'Z' that DRF's JSONRenderer produced for UTC timestamps
+    'DEFAULT_RENDERER_CLASSES': (
+        'drf_orjson_renderer.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'ORJSON_RENDERER_OPTIONS': (
+        orjson.OPT_UTC_Z,
     ),
+    # JSON bodies are decoded with orjson too; form/multipart parsers are
+    # DRF's defaults and still needed for the screenshot upload
+    'DEFAULT_PARSER_CLASSES': (
+        'drf_orjson_renderer.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'EXCEPTION_HANDLER': 'cloudManager.utils.sharkfund_exception_handler',
 
 }
 
@@ -84,6 +106,9 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'BLACKLIST_AFTER_ROTATION': True,
+    # Tokens are minted on every register/login; HMAC signing with
+    # SECRET_KEY is far cheaper than an RSA/EC signature
+    'ALGORITHM': 'HS256',
 }
 
 # Allow localhost for development
@@ -133,6 +158,33 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared Redis cache so cached JWT users and OTP throttles are seen by all
+# workers. Cache errors are treated as misses rather than failing requests.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        'OPTIONS': {
+            'IGNORE_EXCEPTIONS': True,
+        },
+    }
+}
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/5.2/topics/auth/passwords/#how-django-stores-passwords
+
+PASSWORD_HASHERS = [
+    'cloudManager.hashers.CustomArgon2PasswordHasher',
+    'cloudManager.hashers.CustomPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -152,6 +204,27 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Logging
+# cloudManager logs at WARNING unless CLOUDMANAGER_LOG_LEVEL says otherwise,
+# so per-request info/debug calls are dropped before any formatting.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'cloudManager': {
+            'handlers': ['console'],
+            'level': os.environ.get('CLOUDMANAGER_LOG_LEVEL', 'WARNING'),
+        },
+    },
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
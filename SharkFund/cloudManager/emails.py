@@ -0,0 +1,119 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.mail import get_connection, send_mail
+from django.template.loader import get_template
+from django.utils.html import strip_tags
+from functools import lru_cache
+import smtplib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One SMTP connection per process, reused across OTP emails so each send
+# skips the connect/TLS/AUTH round trips. Django's SMTP backend isn't
+# thread-safe, so sends are serialized on the lock.
+_connection = None
+_connection_lock = threading.Lock()
+
+# OTP emails are sent by a single worker thread (sends are serialized on
+# the connection lock anyway). The semaphore caps how many may be waiting;
+# past that, new emails are refused rather than queued without bound.
+# Executor threads are joined at interpreter exit, so queued emails are
+# still sent when a worker shuts down cleanly.
+OTP_EMAIL_QUEUE_SIZE = 100
+_otp_email_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='otp-email')
+_otp_email_slots = threading.BoundedSemaphore(OTP_EMAIL_QUEUE_SIZE)
+
+
+@lru_cache(maxsize=None)
+def get_otp_template():
+    """
+    Load and compile the OTP email template once per process.
+    """
+    return get_template('emails/otp_email.html')
+
+
+def send_otp_email(username, email, otp):
+    """
+    Render and send the password reset OTP email.
+    """
+    html_message = get_otp_template().render({
+        'username': username,
+        'email': email,
+        'otp': otp
+    })
+    plain_message = strip_tags(html_message)
+    send_with_pooled_connection(lambda connection: send_mail(
+        subject='SharFund Password Reset OTP',
+        message=plain_message,
+        from_email='no-reply@sharkfund.in',
+        recipient_list=[email],
+        html_message=html_message,
+        fail_silently=False,
+        connection=connection,
+    ))
+
+
+def send_with_pooled_connection(send):
+    """
+    Call send(connection) with the shared, already-open mail connection,
+    reconnecting once if the server has dropped it while idle.
+    """
+    global _connection
+    with _connection_lock:
+        if _connection is None:
+            _connection = get_connection(fail_silently=False)
+        try:
+            try:
+                _connection.open()
+                return send(_connection)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                logger.info("SMTP connection was closed by the server, reconnecting")
+                _connection.close()
+                _connection.open()
+                return send(_connection)
+        except OSError:
+            # Still failing after the reconnect, e.g. the server stalled past
+            # EMAIL_TIMEOUT (smtplib reports stalled reads and writes as
+            # SMTPServerDisconnected). Drop the connection so the next send
+            # starts fresh instead of reusing a half-finished exchange.
+            logger.warning("SMTP send failed, discarding the connection")
+            _discard_connection()
+            raise
+
+
+def _discard_connection():
+    """
+    Forget the shared connection, closing its socket without the QUIT
+    round trip (which would wait on an unresponsive server again). Call
+    with _connection_lock held.
+    """
+    global _connection
+    connection, _connection = _connection, None
+    smtp = getattr(connection, 'connection', None)
+    if smtp is not None:
+        smtp.close()
+
+
+def send_otp_email_in_background(username, email, otp, on_failure=None):
+    """
+    Queue the OTP email on the mail worker thread so the request doesn't
+    wait on SMTP. Returns False, without queueing, if the queue is full.
+    on_failure() is called from the worker if the send fails.
+    """
+    if not _otp_email_slots.acquire(blocking=False):
+        logger.error("OTP email queue is full, not sending OTP email to %s", email)
+        return False
+
+    def run():
+        try:
+            send_otp_email(username, email, otp)
+        except Exception:
+            logger.error("Failed to send OTP email to %s", email, exc_info=True)
+            if on_failure is not None:
+                on_failure()
+        finally:
+            _otp_email_slots.release()
+
+    _otp_email_executor.submit(run)
+    return True
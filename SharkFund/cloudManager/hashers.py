@@ -0,0 +1,19 @@
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher
+
+
+class CustomArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id tuned to hash in well under Django's default PBKDF2 time.
+    Existing hashes keep verifying and are re-encoded on the user's next login.
+    """
+    time_cost = 2
+    memory_cost = 65536  # KiB (64 MiB)
+    parallelism = 2
+
+
+class CustomPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with a lower work factor than Django's default. Existing
+    hashes keep verifying and are re-encoded on the user's next login.
+    """
+    iterations = 260_000
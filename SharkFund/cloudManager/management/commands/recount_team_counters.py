@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from cloudManager.models import CustomUser, recount_team_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's team/referral counters from the referral tree."
+
+    def handle(self, *args, **options):
+        changed, total = recount_team_counters(CustomUser)
+        self.stdout.write(self.style.SUCCESS(f"Updated team counters for {changed} of {total} users"))
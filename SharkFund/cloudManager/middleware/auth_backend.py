@@ -1,5 +1,11 @@
 from django.contrib.auth.backends import ModelBackend
-from cloudManager.models import CustomUser
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from cloudManager.models import CustomUser, jwt_user_cache_key, JWT_USER_CACHE_TIMEOUT
 from django.db.models import Q
 
 class CustomAuthBackend(ModelBackend):
@@ -13,4 +19,44 @@ class CustomAuthBackend(ModelBackend):
                 return user
         except CustomUser.DoesNotExist:
             return None
-        return None
\ No newline at end of file
+        return None
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that caches the token's user instead of loading it from
+    the database on every request. Entries are dropped whenever the user is
+    saved or deleted, so status/password/is_active changes apply immediately.
+
+    On a cache miss only USER_FIELDS are loaded; views that need the rest of
+    the row (wallet, payment details, profile columns) query for it themselves.
+    """
+    USER_FIELDS = ('id', 'username', 'email', 'address', 'mobile_number', 'status', 'is_active')
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        key = jwt_user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = self.load_user(user_id)
+            cache.set(key, user, JWT_USER_CACHE_TIMEOUT)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
+
+    def load_user(self, user_id):
+        fields = self.USER_FIELDS
+        if api_settings.CHECK_REVOKE_TOKEN:
+            fields += ('password',)
+        try:
+            return self.user_model.objects.only(*fields).get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
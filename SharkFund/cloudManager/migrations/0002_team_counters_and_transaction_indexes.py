@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-15 23:12
+
+from django.db import migrations, models
+
+from cloudManager.models import recount_team_counters
+
+
+def backfill_team_counters(apps, schema_editor):
+    # The new columns start at 0; fill them from the existing referral tree
+    recount_team_counters(apps.get_model('cloudManager', 'CustomUser'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cloudManager', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='active_referrals',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='active_team',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='total_referrals',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='total_team',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'timestamp'], name='tx_wallet_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'transaction_type', 'status', 'timestamp'], name='tx_wallet_type_status_ts_idx'),
+        ),
+        migrations.RunPython(backfill_team_counters, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,15 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models, transaction
+from django.db import connection, models, transaction
 from django.utils import timezone
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db.models.signals import pre_save, pre_delete, post_save
+from django.db.models.signals import pre_save, pre_delete, post_save, post_delete
 from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 from decimal import Decimal
-from django.db.models import Sum
+from collections import defaultdict
+from django.db.models import Case, F, Sum, Value, When
+from django.db.models.functions import Greatest
+from django.core.cache import cache
 import logging
 
 # Set up logging
@@ -24,6 +27,21 @@ PAYMENT_STATUS_CHOICES = (
     ('Failed', 'Failed'),
 )
 
+# Cached user rows for JWT-authenticated requests (see CachedJWTAuthentication)
+JWT_USER_CACHE_TIMEOUT = 300  # seconds
+
+def jwt_user_cache_key(user_id):
+    return f"jwt_user:{user_id}"
+
+# Denormalized referral tree counters on CustomUser
+TEAM_COUNTER_FIELDS = ('total_team', 'active_team', 'total_referrals', 'active_referrals')
+
+# Minimum gap between password reset OTP emails to the same address
+OTP_RESEND_THROTTLE_TIMEOUT = 60  # seconds
+
+def otp_throttle_cache_key(email):
+    return f"otp_throttle:{email}"
+
 class CustomUser(AbstractUser):
     name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
@@ -39,47 +57,53 @@ class CustomUser(AbstractUser):
     )
     last_active = models.DateTimeField(null=True, blank=True, verbose_name="Activation Date")
     country = models.CharField(default="India", max_length=100)
+    # Referral tree counters, kept current by the signals below
+    total_team = models.PositiveIntegerField(default=0, editable=False)
+    active_team = models.PositiveIntegerField(default=0, editable=False)
+    total_referrals = models.PositiveIntegerField(default=0, editable=False)
+    active_referrals = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.username
 
+    # Atomic so the pre_save read of the old position and the post_save
+    # counter update can't interleave with another save of the same user
+    @transaction.atomic
+    def save(self, *args, **kwargs):
+        # The team counters are changed in place with F() updates; never
+        # write a possibly stale in-memory copy of them back over those
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            skip = {*TEAM_COUNTER_FIELDS, *self.get_deferred_fields()}
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skip and field.name not in skip
+            ]
+        super().save(*args, **kwargs)
+
     def update_last_active(self):
         self.last_active = timezone.now()
         self.save()
 
-    @property
-    def total_team(self):
-        def count_referrals(user):
-            referrals = user.referrals.all()
-            direct_count = referrals.count()
-            indirect_count = sum(count_referrals(referral) for referral in referrals)
-            return direct_count + indirect_count
-        return count_referrals(self)
-
-    @property
-    def active_team(self):
-        active_users = set()
-        def collect_active_referrals(user):
-            if not hasattr(user, 'wallet'):
-                return
-            if user.status == 'Active':
-                active_users.add(user.id)
-            for referral in user.referrals.all():
-                collect_active_referrals(referral)
-        user_with_data = CustomUser.objects.prefetch_related(
-            models.Prefetch('referrals', queryset=CustomUser.objects.prefetch_related('wallet', 'referrals')),
-            'wallet'
-        ).get(id=self.id)
-        collect_active_referrals(user_with_data)
-        return len(active_users)
-
-    @property
-    def active_referrals(self):
-        return self.referrals.filter(status='Active').distinct().count()
-
-    @property
-    def total_referrals(self):
-        return self.referrals.count()
+    @staticmethod
+    def chain_ids(user_id):
+        """
+        IDs of user_id and every user above them in the referral chain,
+        fetched with one recursive query. UNION (not UNION ALL) stops the
+        walk if the chain ever loops.
+        """
+        qn = connection.ops.quote_name
+        table = qn(CustomUser._meta.db_table)
+        referred_by = qn(CustomUser._meta.get_field('referred_by').column)
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                WITH RECURSIVE chain (id, referrer_id) AS (
+                    SELECT id, {referred_by} FROM {table} WHERE id = %s
+                    UNION
+                    SELECT u.id, u.{referred_by} FROM {table} u JOIN chain ON u.id = chain.referrer_id
+                )
+                SELECT id FROM chain
+            """, [user_id])
+            return [row[0] for row in cursor.fetchall()]
 
 class OTP(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
@@ -202,6 +226,14 @@ class Transaction(models.Model):
     timestamp = models.DateTimeField(default=timezone.now)
     description = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # History endpoints list a wallet's transactions ordered by time
+            models.Index(fields=['wallet', 'timestamp'], name='tx_wallet_ts_idx'),
+            # Monthly income sums a wallet's completed INCOME rows by month
+            models.Index(fields=['wallet', 'transaction_type', 'status', 'timestamp'], name='tx_wallet_type_status_ts_idx'),
+        ]
+
     def __str__(self):
         return f"{self.transaction_type} of ${self.amount} for {self.wallet.user.username}"
 
@@ -299,28 +331,158 @@ def create_user_wallet(sender, instance, created, **kwargs):
             created_at=timezone.now()
         )
 
+def shifted_counter(field, delta, only_pk=None):
+    """
+    F(field) + delta, floored at 0 so a counter that has drifted (or was
+    never backfilled) can't fail the column's non-negative check. The
+    floor is applied before subtracting, which keeps the intermediate value
+    in range on UNSIGNED columns too. With only_pk, rows other than that
+    user are left unchanged.
+    """
+    amount = Value(abs(delta))
+    if only_pk is not None:
+        amount = Case(When(pk=only_pk, then=amount), default=Value(0))
+    if delta >= 0:
+        return F(field) + amount
+    return Greatest(F(field), amount) - amount
+
+def shift_team_counters(referrer_id, team, active_team, referrals, active_referrals):
+    """
+    Add the given deltas to the team counters of referrer_id and everyone
+    above them, and the direct referral deltas to referrer_id alone.
+    """
+    if referrer_id is None:
+        return
+    CustomUser.objects.filter(pk__in=CustomUser.chain_ids(referrer_id)).update(
+        total_team=shifted_counter('total_team', team),
+        active_team=shifted_counter('active_team', active_team),
+        total_referrals=shifted_counter('total_referrals', referrals, only_pk=referrer_id),
+        active_referrals=shifted_counter('active_referrals', active_referrals, only_pk=referrer_id),
+    )
+
+def recount_team_counters(user_model):
+    """
+    Recompute every user's team counters from the referral tree and write
+    the ones that differ. Takes the model so migrations can pass their
+    historical CustomUser. Returns (users updated, users checked).
+    """
+    rows = list(user_model.objects.values_list('id', 'referred_by_id', 'status', *TEAM_COUNTER_FIELDS))
+    referrals = defaultdict(list)
+    is_active = {}
+    for user_id, referrer_id, account_status, *_ in rows:
+        is_active[user_id] = account_status == 'Active'
+        if referrer_id is not None:
+            referrals[referrer_id].append(user_id)
+
+    # Iterative post-order walk (deep trees would hit the recursion
+    # limit): a user is counted once all of their referrals are
+    counters = {}
+    seen = set()
+    for root_id in is_active:
+        stack = [root_id]
+        while stack:
+            user_id = stack[-1]
+            if user_id not in seen:
+                seen.add(user_id)
+                stack.extend(child for child in referrals[user_id] if child not in seen)
+                continue
+            stack.pop()
+            if user_id in counters:
+                continue
+            children = [child for child in referrals[user_id] if child in counters]
+            direct_active = sum(is_active[child] for child in children)
+            counters[user_id] = (
+                len(children) + sum(counters[child][0] for child in children),
+                direct_active + sum(counters[child][1] for child in children),
+                len(children),
+                direct_active,
+            )
+
+    changed = []
+    for user_id, _, _, *current in rows:
+        if tuple(current) != counters[user_id]:
+            changed.append(user_model(pk=user_id, **dict(zip(TEAM_COUNTER_FIELDS, counters[user_id]))))
+    with transaction.atomic():
+        user_model.objects.bulk_update(changed, TEAM_COUNTER_FIELDS, batch_size=1000)
+    return len(changed), len(rows)
+
+@receiver(post_save, sender=CustomUser)
+def update_team_counters(sender, instance, created, **kwargs):
+    # _team_position is recorded by handle_referral_income_on_activation; a
+    # save that didn't touch status/referred_by leaves it unset
+    if created:
+        position = (None, None, 0, 0)
+    else:
+        position = instance.__dict__.pop('_team_position', None)
+        if position is None:
+            return
+    old_referrer, old_status, team, active_team = position
+    old_active = int(old_status == 'Active')
+    new_active = int(instance.status == 'Active')
+    if old_referrer == instance.referred_by_id:
+        if old_active != new_active:
+            change = new_active - old_active
+            shift_team_counters(old_referrer, 0, change, 0, change)
+        return
+    # Moving under a new referrer takes the user's whole downline along
+    shift_team_counters(old_referrer, -(1 + team), -(old_active + active_team), -1, -old_active)
+    shift_team_counters(instance.referred_by_id, 1 + team, new_active + active_team, 1, new_active)
+
+@receiver(pre_delete, sender=CustomUser)
+def remember_team_position_on_delete(sender, instance, **kwargs):
+    # Read the stored position; the in-memory counters may be stale. The
+    # delete runs in a transaction, so the row lock holds until post_delete
+    instance._team_position = CustomUser.objects.select_for_update().filter(pk=instance.pk).values_list(
+        'referred_by_id', 'status', 'total_team', 'active_team'
+    ).first()
+
+@receiver(post_delete, sender=CustomUser)
+def remove_from_team_counters(sender, instance, **kwargs):
+    # The deleted user's referrals are detached (SET_NULL), so the whole
+    # downline leaves the upline's team
+    position = instance.__dict__.pop('_team_position', None)
+    if position is None:
+        return
+    referrer_id, account_status, team, active_team = position
+    active = int(account_status == 'Active')
+    shift_team_counters(referrer_id, -(1 + team), -(active + active_team), -1, -active)
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_jwt_user_cache(sender, instance, **kwargs):
+    cache.delete(jwt_user_cache_key(instance.pk))
+
 @receiver(pre_save, sender=CustomUser)
-def handle_referral_income_on_activation(sender, instance, **kwargs):
-    if instance.pk:  # Only for existing users being updated
-        try:
-            old_instance = CustomUser.objects.get(pk=instance.pk)
-            if old_instance.status != 'Active' and instance.status == 'Active' and instance.referred_by:
-                referrer = instance.referred_by
-                if hasattr(referrer, 'wallet'):
-                    with transaction.atomic():
-                        Transaction.objects.create(
-                            wallet=referrer.wallet,
-                            amount=Decimal('400.00'),
-                            transaction_type='REFERRAL',
-                            status='COMPLETED',
-                            description=f"Referral bonus for {instance.username}'s activation"
-                        )
-                        logger.info(f"Credited ₹400 referral income to {referrer.username} for {instance.username}'s activation")
-                else:
-                    logger.warning(f"Referrer {referrer.username} has no wallet for referral income")
-        except CustomUser.DoesNotExist:
-            logger.error(f"User {instance.username} not found during pre_save")
-            pass
+def handle_referral_income_on_activation(sender, instance, update_fields=None, **kwargs):
+    if not instance.pk:  # Only for existing users being updated
+        return
+    if update_fields is not None and not {'status', 'referred_by'} & set(update_fields):
+        return
+    # Previous referrer, status and downline size; also used by
+    # update_team_counters. Locked so a concurrent save of this user waits
+    # and then sees the position this save leaves behind
+    previous = CustomUser.objects.select_for_update().filter(pk=instance.pk).values_list(
+        'referred_by_id', 'status', 'total_team', 'active_team'
+    ).first()
+    if previous is None:
+        logger.error(f"User {instance.username} not found during pre_save")
+        return
+    instance._team_position = previous
+    old_status = previous[1]
+    if old_status != 'Active' and instance.status == 'Active' and instance.referred_by:
+        referrer = instance.referred_by
+        if hasattr(referrer, 'wallet'):
+            with transaction.atomic():
+                Transaction.objects.create(
+                    wallet=referrer.wallet,
+                    amount=Decimal('400.00'),
+                    transaction_type='REFERRAL',
+                    status='COMPLETED',
+                    description=f"Referral bonus for {instance.username}'s activation"
+                )
+                logger.info(f"Credited ₹400 referral income to {referrer.username} for {instance.username}'s activation")
+        else:
+            logger.warning(f"Referrer {referrer.username} has no wallet for referral income")
 
 @receiver(post_save, sender=MonthlyIncome)
 def update_wallet_on_monthly_income_save(sender, instance, created, **kwargs):
@@ -1,11 +1,11 @@
 from rest_framework import serializers
-from .models import CustomUser, OTP, Transaction, PaymentDetail, MonthlyIncome, PaymentScreenshot
+from .models import CustomUser, OTP, Transaction, PaymentDetail, PaymentScreenshot
 from datetime import timedelta
 import random
 import string
 from django.utils import timezone
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from django.contrib.auth import authenticate
+from django.db.models import Exists, OuterRef, Q, Subquery
 import logging
 import re
 
@@ -40,7 +40,7 @@ class CustomUserSerializer(serializers.ModelSerializer):
         }
 
     def validate(self, data):
-        logger.info("CustomUserSerializer: Validating data: %s", data)
+        logger.debug("CustomUserSerializer: Validating data: %s", data)
         if data['password'] != data['confirm_password']:
             logger.warning("CustomUserSerializer: Passwords do not match")
             raise serializers.ValidationError({
@@ -54,7 +54,7 @@ class CustomUserSerializer(serializers.ModelSerializer):
         return data
 
     def validate_username(self, value):
-        logger.info("CustomUserSerializer: Validating username: %s", value)
+        logger.debug("CustomUserSerializer: Validating username: %s", value)
         # Ensure username is alphanumeric with underscores, 3-30 characters
         if not re.match(r'^[a-zA-Z]+[0-9]{2,}$', value):
             logger.warning("CustomUserSerializer: Invalid username format: %s", value)
@@ -65,7 +65,7 @@ class CustomUserSerializer(serializers.ModelSerializer):
         return value
 
     def validate_email(self, value):
-        logger.info("CustomUserSerializer: Validating email: %s", value)
+        logger.debug("CustomUserSerializer: Validating email: %s", value)
         value = value.lower()
         if CustomUser.objects.filter(email__iexact=value).exists():
             logger.warning("CustomUserSerializer: Email already exists: %s", value)
@@ -73,7 +73,7 @@ class CustomUserSerializer(serializers.ModelSerializer):
         return value
 
     def validate_mobile_number(self, value):
-        logger.info("CustomUserSerializer: Validating mobile_number: %s", value)
+        logger.debug("CustomUserSerializer: Validating mobile_number: %s", value)
         if value and not value.replace("+", "").isdigit():
             logger.warning("CustomUserSerializer: Invalid mobile number format: %s", value)
             raise serializers.ValidationError(["Mobile number must contain only digits and an optional '+' prefix."])
@@ -83,11 +83,11 @@ class CustomUserSerializer(serializers.ModelSerializer):
         return value
 
     def validate_referred_by(self, value):
-        logger.info("CustomUserSerializer: Validating referred_by: %s", value)
+        logger.debug("CustomUserSerializer: Validating referred_by: %s", value)
         if value:
             try:
                 referrer = CustomUser.objects.get(username=value)
-                logger.info("CustomUserSerializer: Referrer found: %s", referrer.username)
+                logger.debug("CustomUserSerializer: Referrer found: %s", referrer.username)
                 return value
             except CustomUser.DoesNotExist:
                 logger.warning("CustomUserSerializer: Referrer not found: %s", value)
@@ -95,7 +95,7 @@ class CustomUserSerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
-        logger.info("CustomUserSerializer: Creating user with validated data: %s", validated_data)
+        logger.debug("CustomUserSerializer: Creating user with validated data: %s", validated_data)
         validated_data.pop('confirm_password')
         # Map back to model field names
         referred_by_username = validated_data.pop('Referral', None)
@@ -110,15 +110,15 @@ class CustomUserSerializer(serializers.ModelSerializer):
                 address=validated_data.get('address'),
                 mobile_number=mobile_number
             )
-            logger.info("CustomUserSerializer: User created: %s", user.username)
+            logger.debug("CustomUserSerializer: User created: %s", user.username)
 
             if referred_by_username:
-                logger.info("CustomUserSerializer: Linking referrer: %s", referred_by_username)
+                logger.debug("CustomUserSerializer: Linking referrer: %s", referred_by_username)
                 try:
                     referrer = CustomUser.objects.get(username=referred_by_username)
                     user.referred_by = referrer
                     user.save()
-                    logger.info("CustomUserSerializer: Referrer linked for user: %s", user.username)
+                    logger.debug("CustomUserSerializer: Referrer linked for user: %s", user.username)
                 except CustomUser.DoesNotExist:
                     logger.error("CustomUserSerializer: Referrer %s not found during linking", referred_by_username)
                     user.delete()
@@ -142,8 +142,16 @@ class LoginSerializer(serializers.Serializer):
         login = data.get('login').lower()
         password = data.get('password')
 
-        user = authenticate(request=self.context.get('request'), username=login, password=password)
-        if not user:
+        # Single lookup by email or username, then verify the hash directly
+        user = CustomUser.objects.filter(
+            Q(email__iexact=login) | Q(username__iexact=login)
+        ).first()
+        if user is None:
+            # Hash anyway so unknown logins take as long as wrong passwords
+            # and response timing doesn't reveal which accounts exist
+            # (same as ModelBackend.authenticate)
+            CustomUser().set_password(password)
+        if user is None or not user.check_password(password):
             raise serializers.ValidationError({
                 "non_field_errors": ["Invalid email/username or password."]
             })
@@ -189,15 +197,14 @@ class VerifyOTPSerializer(serializers.Serializer):
 
         try:
             user = CustomUser.objects.get(email=email)
-            otp_record = OTP.objects.filter(user=user, otp=otp).first()
+            # Expiry is checked in the WHERE clause; expired rows are only
+            # swept when no live OTP matched
+            now = timezone.now()
+            otp_record = OTP.objects.filter(user=user, otp=otp, expires_at__gt=now).first()
             if not otp_record:
+                expired, _ = OTP.objects.filter(user=user, otp=otp, expires_at__lte=now).delete()
                 raise serializers.ValidationError({
-                    "otp": ["Invalid OTP."]
-                })
-            if not otp_record.is_valid():
-                otp_record.delete()
-                raise serializers.ValidationError({
-                    "otp": ["OTP has expired."]
+                    "otp": ["OTP has expired." if expired else "Invalid OTP."]
                 })
         except CustomUser.DoesNotExist:
             raise serializers.ValidationError({
@@ -225,16 +232,17 @@ class ResetPasswordSerializer(serializers.Serializer):
             })
 
         # Check for valid OTP
-        otp_record = OTP.objects.filter(user=user).first()
+        now = timezone.now()
+        otp_record = OTP.objects.filter(user=user, expires_at__gt=now).first()
         if not otp_record:
+            expired, _ = OTP.objects.filter(user=user, expires_at__lte=now).delete()
+            if expired:
+                raise serializers.ValidationError({
+                    "general": ["OTP has expired. Please request a new OTP."]
+                })
             raise serializers.ValidationError({
                 "general": ["No valid OTP found. Please request a new OTP."]
             })
-        if not otp_record.is_valid():
-            otp_record.delete()
-            raise serializers.ValidationError({
-                "general": ["OTP has expired. Please request a new OTP."]
-            })
 
         # Validate passwords
         if create_password != confirm_password:
@@ -253,129 +261,48 @@ class ResetPasswordSerializer(serializers.Serializer):
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
-    total_deposit = serializers.SerializerMethodField()
-    refer_income = serializers.SerializerMethodField()
-    total_income = serializers.SerializerMethodField()
-    total_withdrawal = serializers.SerializerMethodField()
-    wallet_balance = serializers.SerializerMethodField()
+    WALLET_FIELDS = ('total_deposit', 'refer_income', 'total_income', 'total_withdrawal', 'wallet_balance')
+
     join_date = serializers.DateTimeField()
-    activation_date = serializers.SerializerMethodField()
-    active_status = serializers.SerializerMethodField()
 
     class Meta:
         model = CustomUser
-        fields = [
-            'username', 'total_deposit', 'refer_income',
-            'total_income', 'total_withdrawal', 'wallet_balance',
-            'join_date', 'activation_date', 'active_status'
-        ]
-
-    def get_total_deposit(self, obj):
-        if hasattr(obj, 'wallet'):
-            return float(obj.wallet.total_deposit)
-        return 0.00
-
-    def get_refer_income(self, obj):
-        if hasattr(obj, 'wallet'):
-            return float(obj.wallet.refer_income)
-        return 0.00
-
-    def get_total_income(self, obj):
-        if hasattr(obj, 'wallet'):
-            return float(obj.wallet.total_income)
-        return 0.00
-
-    def get_total_withdrawal(self, obj):
-        if hasattr(obj, 'wallet'):
-            return float(obj.wallet.total_withdrawal)
-        return 0.00
-
-    def get_wallet_balance(self, obj):
-        if hasattr(obj, 'wallet'):
-            return float(obj.wallet.wallet_balance)
-        return 0.00
+        fields = ['username', 'join_date']
+
+    def to_representation(self, obj):
+        # Resolve the wallet once instead of once per wallet-derived field
+        wallet = getattr(obj, 'wallet', None)
+        data = {'username': obj.username}
+        for field in self.WALLET_FIELDS:
+            data[field] = float(getattr(wallet, field)) if wallet is not None else 0.00
+        data['join_date'] = self.fields['join_date'].to_representation(obj.join_date)
+        data['activation_date'] = self.get_activation_date(obj, wallet)
+        data['active_status'] = obj.status == 'Active'
+        return data
 
-    def get_activation_date(self, obj):
-        if hasattr(obj, 'wallet'):
-            first_transaction = Transaction.objects.filter(
-                wallet=obj.wallet,
+    @staticmethod
+    def first_deposit_subquery():
+        """Timestamp of the user's first completed deposit, for annotating as first_deposit_at"""
+        return Subquery(
+            Transaction.objects.filter(
+                wallet__user=OuterRef('pk'),
                 transaction_type='DEPOSIT',
                 status='COMPLETED'
-            ).order_by('timestamp').first()
-            return first_transaction.timestamp if first_transaction else None
-        return None
-
-    def get_active_status(self, obj):
-        return obj.status == 'Active'
-
-class DepositHistorySerializer(serializers.ModelSerializer):
-    serial_number = serializers.SerializerMethodField()
-    method = serializers.SerializerMethodField()
-    status = serializers.SerializerMethodField()
-
-    class Meta:
-        model = Transaction
-        fields = ['serial_number', 'amount', 'timestamp', 'method', 'status']
-
-    def get_serial_number(self, obj):
-        """Serial number based on queryset ordering"""
-        serial_number_map = self.context.get('serial_number_map')
-        if serial_number_map is None:
-            logger.warning(f"serial_number_map missing in context for DepositHistorySerializer, obj.id={obj.id}")
-            return None  # Fallback: return None or a default value
-        return serial_number_map.get(obj.id, None)
-
-    def get_method(self, obj):
-        """Return the actual payment method from the Transaction model"""
-        return "UPI"  # Fallback to 'UPI' if not set
-
-    def get_status(self, obj):
-        """Capitalize status for display"""
-        return obj.status.title()  # E.g., 'COMPLETED' -> 'Completed'
-
-    def validate(self, attrs):
-        """Ensure only DEPOSIT transactions are serialized"""
-        obj = self.instance or Transaction(**attrs)
-        if obj.transaction_type != 'DEPOSIT':
-            raise serializers.ValidationError(
-                f"Only DEPOSIT transactions are allowed, got {obj.transaction_type}"
-            )
-        return attrs
-
-class WithdrawalHistorySerializer(serializers.ModelSerializer):
-    serial_number = serializers.SerializerMethodField()
-    method = serializers.SerializerMethodField()
-    status = serializers.SerializerMethodField()
-
-    class Meta:
-        model = Transaction
-        fields = ['serial_number', 'amount', 'timestamp', 'method', 'status']
-
-    def get_serial_number(self, obj):
-        """Serial number based on queryset ordering"""
-        serial_number_map = self.context.get('serial_number_map')
-        if serial_number_map is None:
-            logger.warning(f"serial_number_map missing in context for WithdrawalHistorySerializer, obj.id={obj.id}")
-            return None  # Fallback: return None or a default value
-        return serial_number_map.get(obj.id, None)
-
-    def get_method(self, obj):
-        """Return the actual payment method from the Transaction model"""
-        return "UPI"  # Fallback to 'UPI' if not set
-
-    def get_status(self, obj):
-        """Capitalize status for display"""
-        return obj.status.title()  # E.g., 'COMPLETED' -> 'Completed'
-
-    def validate(self, attrs):
-        """Ensure only WITHDRAWAL transactions are serialized"""
-        obj = self.instance or Transaction(**attrs)
-        if obj.transaction_type != 'WITHDRAWAL':
-            raise serializers.ValidationError(
-                f"Only WITHDRAWAL transactions are allowed, got {obj.transaction_type}"
-            )
-        return attrs
+            ).order_by('timestamp').values('timestamp')[:1]
+        )
 
+    def get_activation_date(self, obj, wallet):
+        # Use the annotated value when the view fetched it with the user
+        if hasattr(obj, 'first_deposit_at'):
+            return obj.first_deposit_at
+        if wallet is None:
+            return None
+        first_transaction = Transaction.objects.filter(
+            wallet=wallet,
+            transaction_type='DEPOSIT',
+            status='COMPLETED'
+        ).order_by('timestamp').first()
+        return first_transaction.timestamp if first_transaction else None
 
 
 class PaymentDetailSerializer(serializers.ModelSerializer):
@@ -449,11 +376,11 @@ class CustomerProfileSerializer(serializers.ModelSerializer):
 
         # Handle PaymentDetail update or creation
         if payment_detail_data:
-            try:
+            payment_detail = getattr(instance, 'payment_detail', None)
+            if payment_detail is not None:
                 # If payment details already exist, update them
-                payment_detail = instance.payment_detail
                 payment_detail_serializer = PaymentDetailSerializer(payment_detail, data=payment_detail_data, partial=True)
-            except PaymentDetail.DoesNotExist:
+            else:
                 # If payment details don't exist, create a new instance
                 payment_detail_serializer = PaymentDetailSerializer(data=payment_detail_data)
 
@@ -465,60 +392,28 @@ class CustomerProfileSerializer(serializers.ModelSerializer):
         return instance
 
 
-class ReferralSerializer(serializers.ModelSerializer):
-    status = serializers.SerializerMethodField()
-
-    class Meta:
-        model = CustomUser
-        fields = ['username', 'name', 'mobile_number', 'join_date', 'status']
-
-    def get_status(self, obj):
-        """Return 'Active' or 'Not Active' based on CustomUser.status"""
-        return "Active" if obj.status == "Active" else "Not Active"
-    
-
+class ScreenshotImageField(serializers.ImageField):
+    """
+    ImageField that rejects oversized uploads before Pillow opens them.
+    """
+    MAX_SIZE = 5 * 1024 * 1024  # 5MB
+    MAX_PIXELS = 40_000_000  # Well above any phone screenshot
 
-class MonthlyIncomeSerializer(serializers.ModelSerializer):
-    month = serializers.CharField()
-    monthlyPayout = serializers.SerializerMethodField()
-    monthlyIncome = serializers.SerializerMethodField()
-    totalIncome = serializers.SerializerMethodField()
-
-    class Meta:
-        model = MonthlyIncome
-        fields = ['month', 'monthlyPayout', 'monthlyIncome', 'totalIncome']
-
-    def get_monthlyPayout(self, obj):
-        return f"₹{obj.monthly_payout:,.0f}"
-
-    def get_monthlyIncome(self, obj):
-        return f"₹{obj.monthly_income:,.0f}"
-
-    def get_totalIncome(self, obj):
-        return f"₹{obj.total_income:,.0f}"
-    
-
-class TransactionIncomeSerializer(serializers.Serializer):
-    month = serializers.CharField()
-    monthlyPayout = serializers.SerializerMethodField()
-    monthlyIncome = serializers.SerializerMethodField()
-    totalIncome = serializers.SerializerMethodField()
-
-    class Meta:
-        fields = ['month', 'monthlyPayout', 'monthlyIncome', 'totalIncome']
-
-    def get_monthlyPayout(self, obj):
-        return f"₹{obj['amount']:,.0f}"
-
-    def get_monthlyIncome(self, obj):
-        return f"₹{obj['amount']:,.0f}"
-
-    def get_totalIncome(self, obj):
-        return f"₹{obj['amount']:,.0f}"
+    def to_internal_value(self, data):
+        size = getattr(data, 'size', None)
+        if size is not None and size > self.MAX_SIZE:
+            raise serializers.ValidationError("Screenshot file size must not exceed 5MB.")
+        value = super().to_internal_value(data)
+        # Django's ImageField only verify()s the upload, so the header
+        # dimensions are known here without decoding any pixel data
+        width, height = value.image.size
+        if width * height > self.MAX_PIXELS:
+            raise serializers.ValidationError("Screenshot dimensions are too large.")
+        return value
 
 
 class PaymentScreenshotSerializer(serializers.ModelSerializer):
-    screenshot = serializers.ImageField(max_length=None, use_url=True)
+    screenshot = ScreenshotImageField(max_length=None, use_url=True)
 
     class Meta:
         model = PaymentScreenshot
@@ -530,50 +425,41 @@ class PaymentScreenshotSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Amount must be greater than zero.")
         return value
 
-    def validate_screenshot(self, value):
-        max_size = 5 * 1024 * 1024  # 5MB
-        if value.size > max_size:
-            raise serializers.ValidationError("Screenshot file size must not exceed 5MB.")
-        return value
-
     def create(self, validated_data):
         user = self.context['request'].user
         if not user.is_authenticated:
             raise serializers.ValidationError("User must be authenticated.")
-        print(f"[Serializer] Creating PaymentScreenshot for user: {user.username}, amount: {validated_data['amount']}")
         validated_data['user'] = user
-        instance = super().create(validated_data)
-        print(f"[Serializer] Created PaymentScreenshot with ID: {instance.id}, screenshot: {instance.screenshot.url}")
-        return instance
+        return super().create(validated_data)
     
 
 
-
-from rest_framework import serializers
-from .models import Transaction, CustomUser, PaymentDetail
-import logging
-
-# Set up logging
-logger = logging.getLogger(__name__)
-
 class WithdrawalRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
         fields = ['amount']  # Only accept amount from frontend
 
     def validate(self, data):
-        logger.info("Starting validation in WithdrawalRequestSerializer")
+        logger.debug("Starting validation in WithdrawalRequestSerializer")
         user = self.context['request'].user
-        logger.info(f"User: {user.username}")
+        logger.debug("User: %s", user.username)
+
+        # Fetch payment details and the active-referral check in one query.
+        # The sliced Exists only needs to find a 2nd active referral, so it
+        # never counts the whole downline.
+        row = CustomUser.objects.filter(pk=user.pk).select_related('payment_detail').annotate(
+            has_min_active_referrals=Exists(
+                CustomUser.objects.filter(referred_by=OuterRef('pk'), status='Active')[1:2]
+            )
+        ).first()
 
         # Check if user has payment details
-        logger.info("Checking payment details")
-        try:
-            payment_detail = user.payment_detail
-            logger.info(f"Payment details found: UPI={payment_detail.upi_id}, Bank Account={payment_detail.account_number}")
-        except PaymentDetail.DoesNotExist:
+        logger.debug("Checking payment details")
+        payment_detail = getattr(row, 'payment_detail', None)
+        if payment_detail is None:
             logger.error("Payment details not found for user")
             raise serializers.ValidationError("Payment details not found.")
+        logger.debug("Payment details found: UPI=%s, Bank Account=%s", payment_detail.upi_id, payment_detail.account_number)
 
         # Check for valid UPI or valid bank account
         has_upi = bool(payment_detail.upi_id)
@@ -582,42 +468,37 @@ class WithdrawalRequestSerializer(serializers.ModelSerializer):
             payment_detail.account_number,
             payment_detail.ifsc_code,
         ])
-        logger.info(f"Has UPI: {has_upi}, Has Bank: {has_bank}")
+        logger.debug("Has UPI: %s, Has Bank: %s", has_upi, has_bank)
 
         if not (has_upi or has_bank):
             logger.error("Neither UPI nor complete bank details provided")
             raise serializers.ValidationError("Please provide either UPI or complete Bank Account details to withdraw.")
 
         # Check for at least 2 active referrals
-        logger.info("Checking active referrals")
-        active_referrals = CustomUser.objects.filter(
-            referred_by=user,
-            status='Active'  # Changed to match model choice case
-        ).count()
-        logger.info(f"Active referrals count: {active_referrals}")
-
-        if active_referrals < 2:
+        logger.debug("Has at least 2 active referrals: %s", row.has_min_active_referrals)
+
+        if not row.has_min_active_referrals:
             logger.error("Insufficient active referrals")
             raise serializers.ValidationError("You need at least 2 active referrals to request a withdrawal.")
 
-        logger.info("Validation successful")
+        logger.debug("Validation successful")
         return data
 
     def create(self, validated_data):
-        logger.info("Starting create method in WithdrawalRequestSerializer")
+        logger.debug("Starting create method in WithdrawalRequestSerializer")
         user = self.context['request'].user
-        logger.info(f"Creating transaction for user: {user.username}, amount: {validated_data['amount']}")
+        logger.debug("Creating transaction for user: %s, amount: %s", user.username, validated_data['amount'])
         try:
             wallet = user.wallet
-            logger.info(f"Wallet found: {wallet.id}")
+            logger.debug("Wallet found: %s", wallet.id)
             transaction = Transaction.objects.create(
                 wallet=wallet,  # Changed from user to wallet to match model
                 amount=validated_data['amount'],
                 transaction_type='WITHDRAWAL',  # Match case from model choices
                 status='PENDING'  # Match case from model choices
             )
-            logger.info(f"Transaction created: ID={transaction.id}, Type={transaction.transaction_type}, Status={transaction.status}")
+            logger.debug("Transaction created: ID=%s, Type=%s, Status=%s", transaction.id, transaction.transaction_type, transaction.status)
             return transaction
         except Exception as e:
-            logger.error(f"Error creating transaction: {str(e)}")
+            logger.error("Error creating transaction: %s", str(e))
             raise
\ No newline at end of file
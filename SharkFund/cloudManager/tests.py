@@ -1,3 +1,264 @@
-from django.test import TestCase
+import threading
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import orjson
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import emails
+from .models import CustomUser, OTP, Transaction, TEAM_COUNTER_FIELDS, otp_throttle_cache_key
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# Nothing listens on port 1, so every cache call fails and is ignored
+UNREACHABLE_REDIS_CACHE = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:1/0',
+        'OPTIONS': {'IGNORE_EXCEPTIONS': True},
+    }
+}
+
+
+@mock.patch('cloudManager.emails.send_otp_email_in_background')
+class ForgetPasswordThrottleTests(TestCase):
+    url = '/api/v1/forget-password/'
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='reset01', email='reset@example.com', password='securepass1', name='Reset'
+        )
+        self.client = APIClient()
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_repeat_request_is_throttled(self, send):
+        cache.clear()
+        first = self.client.post(self.url, {'email': 'reset@example.com'}, format='json')
+        otp = OTP.objects.get(user=self.user).otp
+        second = self.client.post(self.url, {'email': 'reset@example.com'}, format='json')
+
+        self.assertEqual(first.data['message'], 'OTP sent to your email.')
+        self.assertIn('already sent', second.data['message'])
+        self.assertEqual(send.call_count, 1)
+        self.assertEqual(OTP.objects.get(user=self.user).otp, otp)
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_failed_save_releases_the_throttle(self, send):
+        cache.clear()
+        with mock.patch('cloudManager.views.ForgetPasswordSerializer.save', side_effect=RuntimeError('db down')):
+            failed = self.client.post(self.url, {'email': 'reset@example.com'}, format='json')
+        retry = self.client.post(self.url, {'email': 'reset@example.com'}, format='json')
+
+        self.assertEqual(failed.status_code, 500)
+        self.assertEqual(retry.data['message'], 'OTP sent to your email.')
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_failed_delivery_releases_the_throttle(self, send):
+        cache.clear()
+        self.client.post(self.url, {'email': 'reset@example.com'}, format='json')
+        # The worker reports the failed send through on_failure
+        send.call_args.kwargs['on_failure']()
+        retry = self.client.post(self.url, {'email': 'reset@example.com'}, format='json')
+
+        self.assertEqual(retry.data['message'], 'OTP sent to your email.')
+        self.assertEqual(send.call_count, 2)
+
+    @override_settings(CACHES=UNREACHABLE_REDIS_CACHE)
+    def test_unreachable_cache_does_not_block_reset(self, send):
+        for _ in range(2):
+            response = self.client.post(self.url, {'email': 'reset@example.com'}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['message'], 'OTP sent to your email.')
+        self.assertEqual(send.call_count, 2)
+        self.assertTrue(OTP.objects.filter(user=self.user).exists())
+
+
+class PooledConnectionTests(TestCase):
+    def tearDown(self):
+        emails._connection = None
+
+    @mock.patch('cloudManager.emails.get_connection')
+    def test_timeout_drops_the_connection_and_releases_the_lock(self, get_connection):
+        stalled = mock.Mock()
+        stalled.open.side_effect = TimeoutError('timed out')
+        healthy = mock.Mock()
+        get_connection.side_effect = [stalled, healthy]
+
+        with self.assertRaises(TimeoutError):
+            emails.send_with_pooled_connection(lambda connection: 1)
+        self.assertIsNone(emails._connection)
+        self.assertFalse(emails._connection_lock.locked())
+
+        self.assertEqual(emails.send_with_pooled_connection(lambda connection: 1), 1)
+        self.assertIs(emails._connection, healthy)
+
+
+class OTPEmailQueueTests(TestCase):
+    @mock.patch('cloudManager.emails.send_otp_email')
+    def test_emails_are_sent_on_the_worker(self, send_otp_email):
+        self.assertTrue(emails.send_otp_email_in_background('user', 'user@example.com', '123456'))
+        emails._otp_email_executor.submit(lambda: None).result()
+        send_otp_email.assert_called_once_with('user', 'user@example.com', '123456')
+
+    @mock.patch('cloudManager.emails.send_otp_email', side_effect=OSError('refused'))
+    def test_failed_send_calls_on_failure(self, send_otp_email):
+        on_failure = mock.Mock()
+        emails.send_otp_email_in_background('user', 'user@example.com', '123456', on_failure=on_failure)
+        emails._otp_email_executor.submit(lambda: None).result()
+        on_failure.assert_called_once_with()
+
+    @mock.patch('cloudManager.emails.send_otp_email')
+    @mock.patch('cloudManager.emails._otp_email_slots', threading.BoundedSemaphore(1))
+    def test_full_queue_refuses(self, send_otp_email):
+        emails._otp_email_slots.acquire()
+        self.assertFalse(emails.send_otp_email_in_background('user', 'user@example.com', '123456'))
+        send_otp_email.assert_not_called()
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    @mock.patch('cloudManager.emails.send_otp_email_in_background', return_value=False)
+    def test_forget_password_reports_a_full_queue(self, send):
+        CustomUser.objects.create_user(
+            username='queue01', email='queue@example.com', password='securepass1', name='Queue'
+        )
+        response = APIClient().post('/api/v1/forget-password/', {'email': 'queue@example.com'}, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('general', response.data['errors'])
+        self.assertIsNone(cache.get(otp_throttle_cache_key('queue@example.com')))
+
+
+class LoginTimingTests(TestCase):
+    url = '/api/v1/login/'
+
+    def setUp(self):
+        CustomUser.objects.create_user(
+            username='login01', email='login@example.com', password='securepass1', name='Login'
+        )
+
+    def test_unknown_login_still_hashes_the_password(self):
+        with mock.patch.object(CustomUser, 'set_password', autospec=True) as set_password:
+            response = APIClient().post(self.url, {'login': 'nobody@example.com', 'password': 'x'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        set_password.assert_called_once()
+
+    def test_wrong_and_right_password(self):
+        client = APIClient()
+        wrong = client.post(self.url, {'login': 'LOGIN01', 'password': 'nope'}, format='json')
+        right = client.post(self.url, {'login': 'login@example.com', 'password': 'securepass1'}, format='json')
+        self.assertEqual(wrong.data['errors']['general'], ['Invalid email/username or password.'])
+        self.assertEqual(right.status_code, 200)
+
+
+class TeamCounterTests(TestCase):
+    def make_user(self, username, referred_by=None):
+        return CustomUser.objects.create_user(
+            username=username, email=f'{username}@example.com', password='securepass1',
+            name=username, referred_by=referred_by
+        )
+
+    def counters(self, user):
+        return CustomUser.objects.filter(pk=user.pk).values_list(*TEAM_COUNTER_FIELDS).get()
+
+    def setUp(self):
+        # root -> child -> grandchild
+        self.root = self.make_user('root')
+        self.child = self.make_user('child', self.root)
+        self.grandchild = self.make_user('grandchild', self.child)
+
+    def test_signup_counts_the_whole_upline(self):
+        self.assertEqual(self.counters(self.root), (2, 0, 1, 0))
+        self.assertEqual(self.counters(self.child), (1, 0, 1, 0))
+        self.assertEqual(self.counters(self.grandchild), (0, 0, 0, 0))
+
+    def test_referrer_linked_after_signup(self):
+        # RegisterView creates the user first and sets referred_by afterwards
+        late = self.make_user('late')
+        late.referred_by = self.grandchild
+        late.save()
+        self.assertEqual(self.counters(self.root), (3, 0, 1, 0))
+        self.assertEqual(self.counters(self.grandchild), (1, 0, 1, 0))
+
+    def test_activation_and_deactivation(self):
+        self.grandchild.status = 'Active'
+        self.grandchild.save()
+        self.assertEqual(self.counters(self.root), (2, 1, 1, 0))
+        self.assertEqual(self.counters(self.child), (1, 1, 1, 1))
+
+        self.grandchild.status = 'InActive'
+        self.grandchild.save()
+        self.assertEqual(self.counters(self.root), (2, 0, 1, 0))
+        self.assertEqual(self.counters(self.child), (1, 0, 1, 0))
+
+    def test_move_to_another_referrer_takes_the_downline(self):
+        other = self.make_user('other')
+        self.grandchild.status = 'Active'
+        self.grandchild.save()
+        self.child.referred_by = other
+        self.child.save()
+        self.assertEqual(self.counters(self.root), (0, 0, 0, 0))
+        self.assertEqual(self.counters(other), (2, 1, 1, 0))
+
+    def test_delete_removes_the_downline(self):
+        self.child.delete()
+        self.assertEqual(self.counters(self.root), (0, 0, 0, 0))
+        self.grandchild.refresh_from_db()
+        self.assertIsNone(self.grandchild.referred_by_id)
+
+    def test_decrements_stop_at_zero(self):
+        # Counters that were never backfilled must not make saves or deletes fail
+        self.grandchild.status = 'Active'
+        self.grandchild.save()
+        CustomUser.objects.update(**dict.fromkeys(TEAM_COUNTER_FIELDS, 0))
+        self.grandchild.status = 'InActive'
+        self.grandchild.save()
+        self.assertEqual(self.counters(self.child), (0, 0, 0, 0))
+        self.child.delete()
+        self.assertEqual(self.counters(self.root), (0, 0, 0, 0))
+
+    def test_stale_instance_does_not_overwrite_counters(self):
+        stale_root = CustomUser.objects.get(pk=self.root.pk)
+        self.make_user('late', self.child)
+        stale_root.name = 'Renamed'
+        stale_root.save()
+        self.assertEqual(self.counters(self.root), (3, 0, 1, 0))
+
+    def test_recount_matches_signal_counters(self):
+        other = self.make_user('other', self.grandchild)
+        other.status = 'Active'
+        other.save()
+        self.child.status = 'Active'
+        self.child.save()
+        expected = {user.pk: self.counters(user) for user in CustomUser.objects.all()}
+
+        out = StringIO()
+        call_command('recount_team_counters', stdout=out)
+        self.assertIn('Updated team counters for 0 of 4 users', out.getvalue())
+
+        CustomUser.objects.update(**dict.fromkeys(TEAM_COUNTER_FIELDS, 0))
+        call_command('recount_team_counters', stdout=StringIO())
+        self.assertEqual({user.pk: self.counters(user) for user in CustomUser.objects.all()}, expected)
+
+
+class TransactionHistoryTests(TestCase):
+    def test_equal_timestamps_keep_serial_numbers_in_order(self):
+        user = CustomUser.objects.create_user(
+            username='history01', email='history@example.com', password='securepass1', name='History'
+        )
+        timestamp = timezone.now()
+        for amount in (100, 200, 300):
+            Transaction.objects.create(
+                wallet=user.wallet, amount=amount, transaction_type='DEPOSIT',
+                status='COMPLETED', timestamp=timestamp
+            )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        rows = orjson.loads(b''.join(client.get('/api/v1/transaction/history/').streaming_content))
+        self.assertEqual([row['serial_number'] for row in rows], [1, 2, 3])
+        self.assertEqual([row['amount'] for row in rows], ['300.00', '200.00', '100.00'])
+        page = orjson.loads(b''.join(client.get('/api/v1/transaction/history/?limit=1&offset=1').streaming_content))
+        self.assertEqual(page, rows[1:2])
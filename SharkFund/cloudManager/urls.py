@@ -1,4 +1,4 @@
-from django.urls import path
+from django.urls import path, include
 from .views import (
     RegisterView, CustomTokenRefreshView,
     LoginView, ForgetPasswordView,
@@ -10,10 +10,27 @@ from .views import (
     WithdrawalRequestAPIView
 )
 from rest_framework_simplejwt.views import TokenObtainPairView
-from .serializers import CustomTokenObtainPairSerializer
 
-class CustomTokenObtainPairView(TokenObtainPairView):
-    serializer_class = CustomTokenObtainPairSerializer
+api_v1_patterns = [
+
+    # Authentication 
+    path('register/', RegisterView.as_view(), name='register'),
+    path('login/', LoginView.as_view(), name='login'),
+    path('forget-password/', ForgetPasswordView.as_view(), name='forget_password'),
+    path('verify-otp/', VerifyOTPView.as_view(), name='verify_otp'),
+    path('reset-password/', ResetPasswordView.as_view(), name='reset_password'),
+
+    # Dashboard Data
+    path('profile/', UserProfileView.as_view(), name='user-profile'),
+    path('stats/', TeamReferralStatsView.as_view(), name='team-stats'),
+    path('transaction/history/', DepositHistoryView.as_view(), name='transaction-history'),
+    path('withdrawal/history/', WithdrawalHistoryAPIView.as_view(), name='withdrawal-history'),
+    path('edit/information/', CustomerProfileView.as_view(), name='edit-profile'),
+    path('my-referrals/', MyReferralsView.as_view(), name='my-referrals'),
+    path('earnings/monthly/', MonthlyIncomeView.as_view(), name='monthly-income'),
+    path('payments/upload/', PaymentScreenshotUploadView.as_view(), name="upload-payment"),
+    path('withdrawal/request/', WithdrawalRequestAPIView.as_view(), name='withdraw-request'),
+]
 
 urlpatterns = [
     
@@ -21,23 +38,5 @@ urlpatterns = [
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
 
-    # Authentication 
-    path('api/v1/register/', RegisterView.as_view(), name='register'),
-    path('api/v1/login/', LoginView.as_view(), name='login'),
-    path('api/v1/forget-password/', ForgetPasswordView.as_view(), name='forget_password'),
-    path('api/v1/verify-otp/', VerifyOTPView.as_view(), name='verify_otp'),
-    path('api/v1/reset-password/', ResetPasswordView.as_view(), name='reset_password'),
-
-    # Dashboard Data
-    path('api/v1/profile/', UserProfileView.as_view(), name='user-profile'),
-    path('api/v1/stats/', TeamReferralStatsView.as_view(), name='team-stats'),
-    path('api/v1/transaction/history/', DepositHistoryView.as_view(), name='transaction-history'),
-    path('api/v1/withdrawal/history/', WithdrawalHistoryAPIView.as_view(), name='withdrawal-history'),
-    path('api/v1/edit/information/', CustomerProfileView.as_view(), name='edit-profile'),
-    path('api/v1/my-referrals/', MyReferralsView.as_view(), name='my-referrals'),
-    path('api/v1/earnings/monthly/', MonthlyIncomeView.as_view(), name='monthly-income'),
-    path('api/v1/payments/upload/',PaymentScreenshotUploadView.as_view(),name="upload-payment"),
-    path('api/v1/withdrawal/request/', WithdrawalRequestAPIView.as_view(), name='withdraw-request'),
-    
-    
+    path('api/v1/', include(api_v1_patterns)),
 ]
@@ -0,0 +1,65 @@
+import logging
+
+import orjson
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import exception_handler
+
+logger = logging.getLogger(__name__)
+
+
+# Serializer error keys that the frontend knows under another name
+ERROR_FIELD_MAP = {
+    'non_field_errors': 'general',
+    'mobile': 'mobile_number',
+    'Referral': 'referred_by',
+}
+
+
+def shape_errors(errors):
+    """
+    Copy serializer errors into the response shape the frontend expects,
+    renaming keys through ERROR_FIELD_MAP.
+    """
+    return {ERROR_FIELD_MAP.get(field, field): error_list for field, error_list in errors.items()}
+
+
+def sharkfund_exception_handler(exc, context):
+    """
+    DRF's default handler, plus a 500 in the {'errors': [...]} shape for
+    anything it doesn't handle. Views name the failed action through a
+    failure_message attribute.
+    """
+    response = exception_handler(exc, context)
+    if response is None:
+        view = context.get('view')
+        message = getattr(view, 'failure_message', None) or f"{view.__class__.__name__} failed"
+        logger.error("%s: %s", message, exc, exc_info=exc)
+        return Response({
+            'errors': [f"{message}: {exc}"]
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return response
+
+
+def stream_json_list(rows, batch_size=1000):
+    """
+    Stream an iterable of dicts as a JSON array, encoding batch_size rows
+    at a time so large lists are never held in memory as a whole.
+    Timestamps are encoded like the ORJSONRenderer does (UTC with 'Z').
+    """
+    def chunks():
+        yield b'['
+        separator = b''
+        batch = []
+        for row in rows:
+            batch.append(orjson.dumps(row, option=orjson.OPT_UTC_Z))
+            if len(batch) >= batch_size:
+                yield separator + b','.join(batch)
+                separator = b','
+                batch = []
+        if batch:
+            yield separator + b','.join(batch)
+        yield b']'
+
+    return StreamingHttpResponse(chunks(), content_type='application/json')
@@ -7,14 +7,14 @@ from .serializers import (
     CustomUserSerializer, LoginSerializer,
     ForgetPasswordSerializer, VerifyOTPSerializer,
     ResetPasswordSerializer, UserProfileSerializer,
-    DepositHistorySerializer, WithdrawalHistorySerializer,
-    CustomerProfileSerializer, ReferralSerializer,
-    MonthlyIncomeSerializer, PaymentScreenshotSerializer,
-    WithdrawalRequestSerializer, TransactionIncomeSerializer
+    CustomerProfileSerializer, PaymentScreenshotSerializer,
+    WithdrawalRequestSerializer,
+    CustomTokenObtainPairSerializer, PaymentDetailSerializer
 )
 
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
+from django.db.models import F, Sum, Window
+from django.db.models.functions import RowNumber
 User = get_user_model()
 
 import logging
@@ -23,17 +23,37 @@ import logging
 logger = logging.getLogger(__name__)
 
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.views import TokenRefreshView as BaseTokenRefreshView
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
-from .models import Transaction, CustomUser, MonthlyIncome
+from .utils import shape_errors, stream_json_list
+from .models import (
+    Transaction, CustomUser, MonthlyIncome,
+    otp_throttle_cache_key, OTP_RESEND_THROTTLE_TIMEOUT, TEAM_COUNTER_FIELDS
+)
+from django.core.cache import cache
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
-import logging
-logger = logging.getLogger(__name__)
+from .middleware.auth_backend import CachedJWTAuthentication
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from operator import attrgetter
+
+# Cookie options for the JWT pair set on register/login. SameSite=None
+# cookies are only accepted by browsers when they are also Secure.
+ACCESS_COOKIE_KWARGS = dict(httponly=True, max_age=3600, samesite='None', secure=True)
+REFRESH_COOKIE_KWARGS = dict(httponly=True, max_age=86400, samesite='None', secure=True)
+
+def set_auth_cookies(response, refresh):
+    response.set_cookie('access_token', str(refresh.access_token), **ACCESS_COOKIE_KWARGS)
+    response.set_cookie('refresh_token', str(refresh), **REFRESH_COOKIE_KWARGS)
+
+# User fields echoed back in the login response
+LOGIN_USER_FIELDS = ('username', 'email', 'address', 'mobile_number')
+get_login_user_fields = attrgetter(*LOGIN_USER_FIELDS)
+
+
+class CustomTokenObtainPairView(TokenObtainPairView):
+    serializer_class = CustomTokenObtainPairSerializer
+
 
 class CustomTokenRefreshView(BaseTokenRefreshView):
     def post(self, request, *args, **kwargs):
@@ -52,60 +72,28 @@ class CustomTokenRefreshView(BaseTokenRefreshView):
 
 @method_decorator(csrf_exempt, name='dispatch')
 class RegisterView(APIView):
+    failure_message = "Registration failed"
+
     def post(self, request):
-        logger.info("RegisterView: Received request with data: %s", request.data)
         serializer = CustomUserSerializer(data=request.data)
         try:
             if serializer.is_valid(raise_exception=True):
-                logger.info("RegisterView: Serializer validated data: %s", serializer.validated_data)
                 user = serializer.save()
                 logger.info("RegisterView: User created with username: %s", user.username)
                 refresh = RefreshToken.for_user(user)
-                logger.info("RegisterView: Refresh token generated for user: %s", user.username)
                 response = Response({
                     'message': 'User registered successfully',
                     'user': {
                         'username': user.username,
                     }
                 }, status=status.HTTP_201_CREATED)
-                response.set_cookie(
-                    'access_token',
-                    str(refresh.access_token),
-                    httponly=True,
-                    max_age=3600,
-                    samesite='None',
-                    secure=True
-                )
-                response.set_cookie(
-                    'refresh_token',
-                    str(refresh),
-                    httponly=True,
-                    max_age=86400,
-                    samesite='None',
-                    secure=True
-                )
-                logger.info("RegisterView: Cookies set, returning response")
+                set_auth_cookies(response, refresh)
                 return response
         except ValidationError as e:
-            logger.warning("RegisterView: Validation error: %s", str(e))
-            errors = {}
-            for field, error_list in e.detail.items():
-                if field == 'non_field_errors':
-                    errors['general'] = error_list
-                elif field == 'mobile':  # Map back to frontend field name
-                    errors['mobile_number'] = error_list
-                elif field == 'Referral':  # Map back to frontend field name
-                    errors['referred_by'] = error_list
-                else:
-                    errors[field] = error_list
+            logger.warning("RegisterView: Validation error: %s", e)
             return Response({
-                'errors': errors
+                'errors': shape_errors(e.detail)
             }, status=status.HTTP_400_BAD_REQUEST)
-        except Exception as e:
-            logger.error("RegisterView: Unexpected exception: %s", str(e), exc_info=True)
-            return Response({
-                'errors': [f"Registration failed: {str(e)}"]
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
 
 # Invoke-WebRequest -Uri "http://127.0.0.1:7877/api/v1/register/" -Method POST -Body '{"email":"user3@example.com","password":"securepassword123","confirm_password":"securepassword123","address":"123 Main St","mobile_number":"+1234567890"}' -Headers @{"Content-Type"="application/json";"Origin"="http://localhost:3000"}
@@ -113,37 +101,22 @@ class RegisterView(APIView):
 
 
 class LoginView(APIView):
+    failure_message = "Login failed"
+
     def post(self, request):
         serializer = LoginSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            try:
-                user = serializer.validated_data['user']
-                refresh = RefreshToken.for_user(user)
-                response = Response({
-                    'message': 'Login successful',
-                    'user': {
-                        'username': user.username,
-                        'email': user.email,
-                        'address': user.address,
-                        'mobile_number': user.mobile_number
-                    }
-                }, status=status.HTTP_200_OK)
-                response.set_cookie('access_token', str(refresh.access_token), httponly=True, max_age=3600, samesite='None')
-                response.set_cookie('refresh_token', str(refresh), httponly=True, max_age=86400, samesite='None')
-                return response
-            except Exception as e:
-                return Response({
-                    'errors': [f"Login failed: {str(e)}"]
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            user = serializer.validated_data['user']
+            refresh = RefreshToken.for_user(user)
+            response = Response({
+                'message': 'Login successful',
+                'user': dict(zip(LOGIN_USER_FIELDS, get_login_user_fields(user)))
+            }, status=status.HTTP_200_OK)
+            set_auth_cookies(response, refresh)
+            return response
         else:
-            errors = {}
-            for field, error_list in serializer.errors.items():
-                if field == 'non_field_errors':
-                    errors['general'] = error_list
-                else:
-                    errors[field] = error_list
             return Response({
-                'errors': errors
+                'errors': shape_errors(serializer.errors)
             }, status=status.HTTP_400_BAD_REQUEST)
         
 # Invoke-WebRequest -Uri "http://127.0.0.1:7877/api/v1/login/" -Method POST -Headers @{"Content-Type"="application/json";"Origin"="http://localhost:3000"} -Body '{"login":"user3@example.com","password":"securepassword123"}'
@@ -151,93 +124,94 @@ class LoginView(APIView):
 
 
 class ForgetPasswordView(APIView):
+    failure_message = "Failed to send OTP"
+
     def post(self, request):
         serializer = ForgetPasswordSerializer(data=request.data)
         if serializer.is_valid():
-            try:
-                user, otp = serializer.save()
-                html_message = render_to_string('emails/otp_email.html', {
-                    'username': user.username,
-                    'email': user.email,
-                    'otp': otp
-                })
-                plain_message = strip_tags(html_message)
-                send_mail(
-                    subject='SharFund Password Reset OTP',
-                    message=plain_message,
-                    from_email='no-reply@sharkfund.in',
-                    recipient_list=[user.email],
-                    html_message=html_message,
-                    fail_silently=False,
-                )
+            # Repeat requests inside the throttle window keep the OTP already
+            # emailed instead of replacing it and sending another mail. Only an
+            # explicit False means the key exists; an unreachable cache returns
+            # None and must not block password resets.
+            throttle_key = otp_throttle_cache_key(serializer.validated_data['email'])
+            if cache.add(throttle_key, 1, OTP_RESEND_THROTTLE_TIMEOUT) is False:
                 return Response({
-                    'message': 'OTP sent to your email.'
+                    'message': 'OTP already sent to your email. Please wait a minute before requesting another.'
                 }, status=status.HTTP_200_OK)
-            except Exception as e:
+            # If the OTP never reaches the user, release the throttle so they
+            # can ask again straight away
+            try:
+                user, otp = serializer.save()
+            except Exception:
+                cache.delete(throttle_key)
+                raise
+            # Imported here so only this endpoint loads the mail/template stack
+            from .emails import send_otp_email_in_background
+            queued = send_otp_email_in_background(
+                user.username, user.email, otp, on_failure=lambda: cache.delete(throttle_key)
+            )
+            if not queued:
+                cache.delete(throttle_key)
                 return Response({
-                    'errors': [f"Failed to send OTP: {str(e)}"]
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                    'errors': {'general': ["Unable to send OTP right now. Please try again shortly."]}
+                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            return Response({
+                'message': 'OTP sent to your email.'
+            }, status=status.HTTP_200_OK)
         else:
-            errors = {}
-            for field, error_list in serializer.errors.items():
-                errors[field] = error_list
             return Response({
-                'errors': errors
+                'errors': shape_errors(serializer.errors)
             }, status=status.HTTP_400_BAD_REQUEST)
 
-class VerifyOTPView(APIView): 
+class VerifyOTPView(APIView):
+    failure_message = "OTP verification failed"
+
     def post(self, request):
         serializer = VerifyOTPSerializer(data=request.data)
         if serializer.is_valid():
-            try:
-                return Response({
-                    'message': 'OTP is Correct'
-                }, status=status.HTTP_200_OK)
-            except Exception as e:
-                return Response({
-                    'errors': [f"OTP verification failed: {str(e)}"]
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return Response({
+                'message': 'OTP is Correct'
+            }, status=status.HTTP_200_OK)
         else:
-            errors = {}
-            for field, error_list in serializer.errors.items():
-                errors[field] = error_list
             return Response({
-                'errors': errors
+                'errors': shape_errors(serializer.errors)
             }, status=status.HTTP_400_BAD_REQUEST)
 
 class ResetPasswordView(APIView):
+    failure_message = "Password reset failed"
+
     def post(self, request):
         serializer = ResetPasswordSerializer(data=request.data)
         if serializer.is_valid():
-            try:
-                user = serializer.validated_data['user']
-                otp_record = serializer.validated_data['otp_record']
-                user.set_password(serializer.validated_data['create_password'])
-                user.save()
-                otp_record.delete()  # Clear OTP
-                return Response({
-                    'message': 'Password changed successfully'
-                }, status=status.HTTP_200_OK)
-            except Exception as e:
-                return Response({
-                    'errors': [f"Password reset failed: {str(e)}"]
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            user = serializer.validated_data['user']
+            otp_record = serializer.validated_data['otp_record']
+            user.set_password(serializer.validated_data['create_password'])
+            user.save()
+            otp_record.delete()  # Clear OTP
+            return Response({
+                'message': 'Password changed successfully'
+            }, status=status.HTTP_200_OK)
         else:
-            errors = {}
-            for field, error_list in serializer.errors.items():
-                errors[field] = error_list
             return Response({
-                'errors': errors
+                'errors': shape_errors(serializer.errors)
             }, status=status.HTTP_400_BAD_REQUEST)
         
 
 
 class UserProfileView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        serializer = UserProfileSerializer(request.user)
+        # Load only the columns UserProfileSerializer reads, wallet and
+        # activation date included, in a single query
+        user = CustomUser.objects.select_related('wallet').only(
+            'username', 'join_date', 'status',
+            *(f'wallet__{field}' for field in UserProfileSerializer.WALLET_FIELDS)
+        ).annotate(
+            first_deposit_at=UserProfileSerializer.first_deposit_subquery()
+        ).get(pk=request.user.pk)
+        serializer = UserProfileSerializer(user)
         return Response(serializer.data)
     
 
@@ -246,79 +220,69 @@ class TeamReferralStatsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-
-        # Direct Referrals
-        direct_referrals = User.objects.filter(referred_by=user)
-        total_referrals = direct_referrals.count()
-        active_referrals = direct_referrals.filter(status='Active').count()
-
-        # Recursive function to get total and active team
-        def get_team(user):
-            total = 0
-            active = 0
-            referrals = User.objects.filter(referred_by=user)
-
-            for referral in referrals:
-                total += 1
-                if referral.status == 'Active':
-                    active += 1
-                sub_total, sub_active = get_team(referral)
-                total += sub_total
-                active += sub_active
-
-            return total, active
-
-        total_team, active_team = get_team(user)
-
-        data = {
-            'total_team': total_team,
-            'active_team': active_team,
-            'total_referrals': total_referrals,
-            'active_referrals': active_referrals
-        }
-
+        # The counters are kept on the user row by signals; read them fresh
+        # rather than from the (cached) request.user
+        data = User.objects.filter(pk=request.user.pk).values(*TEAM_COUNTER_FIELDS).get()
         return Response(data, status=status.HTTP_200_OK)
 
 
+def stream_transaction_history(user_id, transaction_type, offset=0, limit=None):
+    """
+    Stream a user's transactions of one type, newest first. Serial numbers
+    come from the database so a paged slice keeps its absolute numbering.
+    """
+    transactions = Transaction.objects.filter(
+        wallet__user_id=user_id,
+        transaction_type=transaction_type
+    ).annotate(
+        # id breaks timestamp ties the same way in both orderings, so serial
+        # numbers stay in sequence and stable across pages
+        serial_number=Window(RowNumber(), order_by=[F('timestamp').desc(), F('id').desc()])
+    ).order_by('-timestamp', '-id').values('serial_number', 'amount', 'timestamp', 'status')
+    if limit is not None:
+        transactions = transactions[offset:offset + limit]
+    elif offset:
+        transactions = transactions[offset:]
+
+    return stream_json_list(
+        {
+            'serial_number': txn['serial_number'],
+            'amount': str(txn['amount']),
+            'timestamp': txn['timestamp'],
+            'method': 'UPI',
+            'status': txn['status'].title(),
+        }
+        for txn in transactions.iterator(chunk_size=1000)
+    )
+
 
 class DepositHistoryView(APIView):
     permission_classes = [IsAuthenticated]
+    max_limit = 100
 
     def get(self, request):
-        # Fetch user's DEPOSIT transactions ordered by timestamp
-        transactions = Transaction.objects.filter(
-            wallet__user=request.user,
-            transaction_type='DEPOSIT'
-        ).order_by('-timestamp')
-        
-        logger.info(f"Fetched {transactions.count()} DEPOSIT transactions for user {request.user.username}")
-        
-        # Prepare serial number mapping (id -> serial number)
-        serial_number_map = {txn.id: idx + 1 for idx, txn in enumerate(transactions)}
-
-        # Pass serial number mapping into context
-        serializer = DepositHistorySerializer(
-            transactions,
-            many=True,
-            context={'serial_number_map': serial_number_map}
-        )
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Optional ?limit=&offset= paging; without them the full history is returned
+        try:
+            offset = int(request.query_params.get('offset', 0))
+            limit = int(request.query_params['limit']) if 'limit' in request.query_params else None
+            if offset < 0 or (limit is not None and limit < 1):
+                raise ValueError
+        except ValueError:
+            return Response({
+                'errors': {'general': ["'limit' must be a positive integer and 'offset' a non-negative integer."]}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if limit is not None:
+            limit = min(limit, self.max_limit)
+
+        logger.info("Streaming DEPOSIT transactions for user %s", request.user.username)
+        return stream_transaction_history(request.user.id, 'DEPOSIT', offset, limit)
 
 
 class WithdrawalHistoryAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        withdrawals = user.wallet.transactions.filter(transaction_type='WITHDRAWAL').order_by('-timestamp')
-
-        data = []
-        for index, transaction in enumerate(withdrawals, start=1):
-            serializer = WithdrawalHistorySerializer(transaction, context={'serial_number': index})
-            data.append(serializer.data)
-
-        return Response(data)
+        return stream_transaction_history(request.user.id, 'WITHDRAWAL')
 
 
 
@@ -326,17 +290,26 @@ class CustomerProfileView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        serializer = CustomerProfileSerializer(request.user)
+        # Load only the columns CustomerProfileSerializer reads
+        user = CustomUser.objects.select_related('referred_by', 'payment_detail').only(
+            'username', 'email', 'name', 'mobile_number', 'country', 'join_date',
+            'referred_by__name', 'referred_by__email',
+            *(f'payment_detail__{field}' for field in PaymentDetailSerializer.Meta.fields)
+        ).get(pk=request.user.pk)
+        serializer = CustomerProfileSerializer(user)
         return Response(serializer.data)
     
     # The serializer's update method handles both user and payment details
     def put(self, request):
-        user = request.user
+        # Fetch payment details and sponsor with the user so update() and the
+        # response don't trigger lazy lookups
+        user = CustomUser.objects.select_related('referred_by', 'payment_detail').get(pk=request.user.pk)
         serializer = CustomerProfileSerializer(user, data=request.data, partial=True)
 
         if serializer.is_valid():
-            serializer.save() 
-            return Response(CustomerProfileSerializer(user).data)
+            serializer.save()
+            # .data re-reads the saved instance; no second serializer needed
+            return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -344,16 +317,21 @@ class MyReferralsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Get the logged-in user
-        user = request.user
-
-        # Fetch all users referred by the current user
-        referrals = CustomUser.objects.filter(referred_by=user).select_related('wallet')
-
-        # Serialize the data
-        serializer = ReferralSerializer(referrals, many=True)
-
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Fetch all users referred by the current user as plain rows
+        referrals = CustomUser.objects.filter(referred_by_id=request.user.id).values_list(
+            'username', 'name', 'mobile_number', 'join_date', 'status'
+        )
+        data = [
+            {
+                'username': username,
+                'name': name,
+                'mobile_number': mobile_number,
+                'join_date': join_date,
+                'status': 'Active' if account_status == 'Active' else 'Not Active',
+            }
+            for username, name, mobile_number, join_date, account_status in referrals
+        ]
+        return Response(data, status=status.HTTP_200_OK)
     
 
 from django.db.models.functions import TruncMonth
@@ -364,7 +342,7 @@ class MonthlyIncomeView(APIView):
     def get(self, request):
         # Query INCOME transactions for the user, group by month
         transactions = Transaction.objects.filter(
-            wallet__user=request.user,
+            wallet__user_id=request.user.id,
             transaction_type='INCOME',
             status='COMPLETED'
         ).annotate(
@@ -373,17 +351,17 @@ class MonthlyIncomeView(APIView):
             total_amount=Sum('amount')
         ).order_by('-month')
 
-        # Transform to serializer-compatible format
-        income_data = [
-            {
+        # One formatted amount fills all three columns
+        income_data = []
+        for tx in transactions:
+            amount = f"₹{tx['total_amount']:,.0f}"
+            income_data.append({
                 'month': tx['month'].strftime('%B %Y'),
-                'amount': tx['total_amount']
-            }
-            for tx in transactions
-        ]
-
-        serializer = TransactionIncomeSerializer(income_data, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+                'monthlyPayout': amount,
+                'monthlyIncome': amount,
+                'totalIncome': amount,
+            })
+        return Response(income_data, status=status.HTTP_200_OK)
 
 
 
@@ -391,17 +369,18 @@ class PaymentScreenshotUploadView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
-        print(f"[View] Received POST request from user: {request.user.username}")
-        print(f"[View] Request data: {dict(request.data)}")
+        screenshot = request.FILES.get('screenshot')
+        logger.debug("PaymentScreenshotUploadView: upload from %s (%s bytes)",
+                     request.user.username, screenshot.size if screenshot else None)
         serializer = PaymentScreenshotSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            serializer.save()
-            print(f"[View] Serializer saved successfully: {serializer.data}")
+            payment = serializer.save()
+            logger.debug("PaymentScreenshotUploadView: saved payment screenshot %s", payment.pk)
             return Response({
                 'message': 'Payment screenshot uploaded successfully',
                 'data': serializer.data
             }, status=status.HTTP_201_CREATED)
-        print(f"[View] Serializer errors: {serializer.errors}")
+        logger.debug("PaymentScreenshotUploadView: invalid upload: %s", serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 